@@ -1,4 +1,8 @@
+# built-in
+import logging
+
 # 3rd party
+import numpy as np
 import pandas as pd
 
 # custom
@@ -6,10 +10,63 @@ from commons import (
     setup_logging,
 )
 
+# exit decisions returned by _exit_decisions
+_NO_EXIT, _STOP_LOSS_LONG, _STOP_LOSS_SHORT, _EXIT_LONG, _EXIT_SHORT = range(5)
+_EXIT_TYPES = {
+    _STOP_LOSS_LONG: 'long',
+    _STOP_LOSS_SHORT: 'short',
+    _EXIT_LONG: 'long',
+    _EXIT_SHORT: 'short',
+}
+
+# entry type codes of purchease candidates and trades
+_LONG, _SHORT = 0, 1
+_ENTRY_TYPES = np.array(['long', 'short'], dtype=object)
+
+
 class AccountBankruptError(Exception):
     pass
 
 
+def _to_cents(value):
+    """Converts money *value* to integer number of cents."""
+    return int(round(value*100))
+
+
+def _exit_decisions(owned_side, present, exit_long, exit_short, stop_loss, low, high, price, check_stop_loss):
+    """
+    Decides which owned positions should be closed in given session. All arrays are session rows
+    (one value per symbol), *owned_side* is 1 for long, -1 for short and 0 for not owned symbols.
+    Returns array with exit decisions (_NO_EXIT, _STOP_LOSS_LONG, ...) and array with prices for
+    which positions are closed.
+    """
+    # safe check if missing ds for given owned symbol
+    owned = present & (owned_side != 0)
+    # For SL one needs to look at high/low prices. These show daily range of price
+    # variation. SL may be executed anytime during session.
+    if check_stop_loss:
+        # During session market price got below SL at least for some time
+        stop_loss_long = owned & (owned_side == 1) & (low <= stop_loss)
+        # During session market price got above SL at least for some time
+        stop_loss_short = owned & (owned_side == -1) & (high >= stop_loss)
+    else:
+        stop_loss_long = stop_loss_short = np.zeros(owned_side.shape[0], dtype=bool)
+    # 1) if stop loss does not exists: check usual exit signal
+    # 2) in case stop loss exists but it was not triggered: check usual exit signal
+    by_signal = owned & ~stop_loss_long & ~stop_loss_short
+    signal_long = by_signal & (exit_long == 1)
+    signal_short = by_signal & ~signal_long & (exit_short == 1)
+    decisions = np.select(
+        [stop_loss_long, stop_loss_short, signal_long, signal_short],
+        [_STOP_LOSS_LONG, _STOP_LOSS_SHORT, _EXIT_LONG, _EXIT_SHORT],
+        _NO_EXIT,
+    ).astype(np.int8)
+    exit_prices = np.where(
+        stop_loss_long | stop_loss_short, stop_loss, np.where(signal_long | signal_short, price, np.nan)
+    )
+    return decisions, exit_prices
+
+
 class Backtester():
     def __init__(self, signals, price_label='close', init_capital=10000, logger=None, debug=False, 
                  position_sizer=None, stop_loss=False, auto_stop_loss=False, volatility_lb=14,
@@ -31,356 +88,488 @@ class Backtester():
         self.stop_loss = stop_loss
         self.auto_stop_loss = auto_stop_loss
         self.volatility_lb = volatility_lb
-        self.log = setup_logging(logger=logger, debug=debug)
-        self.signals = self._prepare_signal(signals)
         self.high_label = high_label
         self.low_label = low_label
+        self.log = setup_logging(logger=logger, debug=debug)
+        # building debug messages is expensive, so they are built only when they will be logged
+        self._dbg = self.log.isEnabledFor(logging.DEBUG)
+        self._prepare_signal(signals)
 
     def run(self, test_days=None):
         self._reset_backtest_state()
 
         self.log.debug('Starting backtest. Initial capital:{}, Available symbols: {}'.format(
-            self._available_money, list(self.signals.keys())
+            self._available_money, list(self._symbols)
         ))
 
-        symbols_in_day = {}
-        symbols_next_days = {} # {sym: {day1: day2, day2:day3, ...}, ...}
-        for sym_n, sym_v in self.signals.items():
-            _dss = sorted(sym_v[self.price_label].keys())
-            symbols_next_days[sym_n] = {val: _dss[idx+1] for idx, val in enumerate(_dss[:-1])}
-            for ds in _dss:
-                if ds in symbols_in_day:
-                    symbols_in_day[ds].append(sym_n)
-                else:
-                    symbols_in_day[ds] = [sym_n]
-        days = sorted(symbols_in_day.keys())
+        check_stop_loss = (self.stop_loss == True) or (self.auto_stop_loss != False)
+        use_auto_stop_loss = self.auto_stop_loss != False
+        days = self._index
         if test_days:
             days = days[:test_days]
-        else:
-            days = days
-
-        for idx, ds in enumerate(days):
-            self.log.debug('['+15*'-'+str(ds)[0:10]+15*'-'+']')
-            self.log.debug('\tSymbols available in given session: ' + str(symbols_in_day[ds]))
-
-            owned_shares = list(self._owned_shares.keys())
-            self.log.debug('\t[-- SELL START --]')
-            if len(owned_shares) == 0:
-                self.log.debug('\t\tNo shares owned. Nothing to sell.')
-            else:
-                self.log.debug(
-                    '\tOwned shares: ' + ', '.join('{}={}'.format(s, int(self._owned_shares[s]['cnt'])) 
-                        for s in sorted(owned_shares))
+
+        # local aliases - attributes below are looked up for every session and symbol
+        dbg = self._dbg
+        debug = self.log.debug
+        owned = self._owned_shares
+        symbols = self._symbols
+        symbol_idx = self._symbol_idx
+        presence = self._presence
+        next_present = self._next_present
+        n_sessions = len(self._index)
+        sell = self._sell
+        get_price = self._get_price
+        ds_str = self._ds_str
+        for i, ds in enumerate(days):
+            present = presence[i]
+            owned_shares = list(owned.keys())
+            if dbg:
+                debug('['+15*'-'+ds_str[i]+15*'-'+']')
+                debug('\tSymbols available in given session: ' + str(list(symbols[present])))
+                debug('\t[-- SELL START --]')
+                if len(owned_shares) == 0:
+                    debug('\t\tNo shares owned. Nothing to sell.')
+                else:
+                    debug(
+                        '\tOwned shares: ' + ', '.join('{}={}'.format(s, int(owned[s]['cnt'])) 
+                            for s in sorted(owned_shares))
+                    )
+            low, high = self._low[i], self._high[i]
+            decisions, exit_prices = _exit_decisions(
+                self._owned_side, present, self._exit_long[i], self._exit_short[i], self._stop_loss[i],
+                low, high, self._price_matrix[i], check_stop_loss,
+            )
+            exiting = np.flatnonzero(decisions)
+            if len(exiting):
+                exit_fees = np.zeros(len(decisions))
+                exit_fees[exiting] = self.position_sizer.calculate_fee_batch(
+                    np.abs(self._owned_cnt[exiting]) * exit_prices[exiting]
                 )
             available_owned_shares = []
+            # sells are done in order of buying, same as owned shares are stored
             for symbol in owned_shares:
-                # safe check if missing ds for given owned symbol
-                if not symbol in symbols_in_day[ds]:
+                j = symbol_idx[symbol]
+                if not present[j]:
                     continue
-                current_sym_price = self._get_price(symbol, ds)
-                self.log.debug('\t+ Checking exit signal for: ' + symbol)
-                _sold = 0
-                # 0) check if stop loss
-                if (self.stop_loss == True) or (self.auto_stop_loss != False):
-                    stop_loss_price = self.signals[symbol]['stop_loss'][ds]
-                    trade_type = self._trades[self._owned_shares[symbol]['trx_id']]['type']
-                    # For SL one needs to look at high/low prices. These show daily range of price
-                    # variation. SL may be executed anytime during session.
-                    price_long_sl = self._get_price(symbol, ds, label=self.low_label)
-                    price_short_sl = self._get_price(symbol, ds, label=self.high_label)
-                    # During session market price got below SL at least for some time 
-                    if (trade_type == 'long') and (price_long_sl <= stop_loss_price):
-                        self.log.debug(f'\t\t LONG STOP LOSS TRIGGERED - EXITING (low: {price_long_sl})')
-                        self._sell(symbol, stop_loss_price, ds, 'long')
-                        _sold = 1
-                    # During session market price got above SL at least for some time
-                    elif (trade_type == 'short') and (price_short_sl >= stop_loss_price):
-                        self.log.debug(f'\t\t SHORT STOP LOSS TRIGGERED - EXITING (high : {price_short_sl})')
-                        self._sell(symbol, stop_loss_price, ds, 'short')
-                        _sold = 1
-                # 1) if stop loss does not exists: check usual exit signal
-                # 2) in case stop loss exists but it was not triggered: check usual exit signal
-                if (self.signals[symbol]['exit_long'][ds] == 1) and (_sold == 0):
-                    self.log.debug('\t\t EXIT LONG')
-                    self._sell(symbol, current_sym_price, ds, 'long')
-                    _sold = 1
-                elif (self.signals[symbol]['exit_short'][ds] == 1) and (_sold == 0):
-                    self.log.debug('\t\t EXIT SHORT')
-                    self._sell(symbol, current_sym_price, ds, 'short')
-                    _sold = 1
-                if _sold == 0:
+                if dbg:
+                    debug('\t+ Checking exit signal for: ' + symbol)
+                decision = decisions[j]
+                if decision == _NO_EXIT:
                     available_owned_shares.append(symbol)
-                    self.log.debug('\t+ Not exiting from: ' + symbol)
-                elif (_sold == 1) and (self.auto_stop_loss != False):
+                    if dbg:
+                        debug('\t+ Not exiting from: ' + symbol)
+                    continue
+                if dbg:
+                    if decision == _STOP_LOSS_LONG:
+                        debug(f'\t\t LONG STOP LOSS TRIGGERED - EXITING (low: {low[j]})')
+                    elif decision == _STOP_LOSS_SHORT:
+                        debug(f'\t\t SHORT STOP LOSS TRIGGERED - EXITING (high : {high[j]})')
+                    elif decision == _EXIT_LONG:
+                        debug('\t\t EXIT LONG')
+                    elif decision == _EXIT_SHORT:
+                        debug('\t\t EXIT SHORT')
+                sell(symbol, float(exit_prices[j]), i, _EXIT_TYPES[decision], float(exit_fees[j]))
+                if use_auto_stop_loss:
                     self._auto_stop_loss_tracker.pop(symbol, None)
 
-            if self._available_money < 0:
+            if self._available_cents < 0:
                 raise AccountBankruptError(
                     "Account bankrupted! Money after sells is: {}. Backtester cannot run anymore!".format(
                         self._available_money
                     ))
 
-            self.log.debug('\t[-- SELL END --]')
-            self.log.debug('\t[-- BUY START --]')
-            purchease_candidates = []
-            for sym in symbols_in_day[ds]:
-                cur_price = self._get_price(sym, ds)
-                # set up back-up price for all available symbols in given day
-                price = self._backup_prices[sym] = (cur_price, ds)
-                if self.signals[sym]['entry_long'][ds] == 1:
-                    purchease_candidates.append(self._define_candidate(cur_price, sym, ds, 'long'))
-                elif self.signals[sym]['entry_short'][ds] == 1:
-                    purchease_candidates.append(self._define_candidate(cur_price, sym, ds, 'short'))
-            if purchease_candidates == []:
-                self.log.debug('\t\tNo candidates to buy.')
-            else:
-                self.log.debug('\tCandidates to buy: {}'.format([c['symbol'] for c in purchease_candidates]))
-
-            capital_at_time = self._available_money + self._calculate_account_value(ds) + self._get_money_from_short()
-            symbols_to_buy = self.position_sizer.decide_what_to_buy(
-                self._available_money*1.0,  # multplication is to create new object instead of using actual pointer
-                purchease_candidates,
-                capital = capital_at_time,
-                volatility = {
-                    c['symbol']: self.signals[c['symbol']]['volatility'][ds] 
-                    for c in purchease_candidates
-                }
-            )
-            for trx_details in symbols_to_buy:
-                self._buy(trx_details, ds)
-                available_owned_shares.append(trx_details['symbol'])
-            self.log.debug('\t[--  BUY END --]')
+            if dbg:
+                debug('\t[-- SELL END --]')
+                debug('\t[-- BUY START --]')
+            # candidates are described by symbol indices and entry type codes (long entry takes precedence)
+            entry_long = self._entry_long[i]
+            cand_idx = np.nonzero((entry_long | self._entry_short[i]) & present)[0]
+            cand_codes = np.where(entry_long[cand_idx] == 1, _LONG, _SHORT).astype(np.int8)
+            cand_symbols = symbols[cand_idx]
+            cand_prices = self._price_matrix[i, cand_idx]
+            if dbg:
+                if len(cand_idx) == 0:
+                    debug('\t\tNo candidates to buy.')
+                else:
+                    debug('\tCandidates to buy: {}'.format(list(cand_symbols)))
+
+            buy_orders = ()
+            if len(cand_idx):
+                capital_at_time = (
+                    self._available_money + self._calculate_account_value(i) + self._get_money_from_short()
+                )
+                stop_loss = self._candidates_stop_loss(i, cand_idx, cand_prices, cand_codes)
+                buy_orders = self._buy_orders(
+                    self._available_money, capital_at_time, cand_idx, cand_codes, cand_prices,
+                    self._volatility[i, cand_idx], stop_loss,
+                )
+            for pos, shares_count, trx_value, fee in buy_orders:
+                self._buy(
+                    cand_idx[pos], cand_codes[pos], float(cand_prices[pos]), shares_count, trx_value, fee, i
+                )
+                available_owned_shares.append(cand_symbols[pos])
+            if dbg:
+                debug('\t[--  BUY END --]')
 
             # update auto_stop_loss for available owned shares. it will be applied to existing next day 
             # based on data from current day
-            if self.auto_stop_loss != False:
+            if use_auto_stop_loss:
                 for sym in available_owned_shares:
-                    if (sym not in symbols_in_day[ds]) or (ds not in symbols_next_days[sym]):
+                    j = symbol_idx[sym]
+                    next_i = next_present[i, j]
+                    if (not present[j]) or (next_i == n_sessions):
                         continue
-                    try:
-                        asl = self._update_auto_stop_loss(
-                            sym, self._get_price(sym, ds), ds, symbols_next_days[sym][ds]
-                        )
-                        self.log.debug(f'\t Updated SL [{sym}]: {symbols_next_days[sym][ds]}: {asl}')
-                    except IndexError:
-                        # this will be the case only once (at the last processed day)
-                        pass
-
-            self._summarize_day(ds)
-        return self._run_output(), self._trades
+                    asl = self._update_auto_stop_loss(sym, j, get_price(sym, i), i, next_i)
+                    if dbg:
+                        debug(f'\t Updated SL [{sym}]: {self._index[next_i]}: {asl}')
+
+            self._summarize_day(i, ds)
+        return self._run_output(), self._trades_output()
 
     def _prepare_signal(self, signals):
-        """Converts to expected dictionary form."""
+        """
+        Builds (dates x symbols) matrices with signals. Rows are aligned to one, sorted dates index
+        (`_index`) and columns to `_symbols`, so a session of a symbol is accessed by (row, column) index.
+        """
         self.log.debug('Prepareing signals')
-        _signals = {}
+        frames = {}
         for k, df in signals.items():
             # ignore if empty dataframe
             if df.shape[0] == 0:
                 continue
             # initialize stop_loss column if needed
             if 'stop_loss' not in df.columns:
-                df.loc[:, 'stop_loss'] = None
+                df.loc[:, 'stop_loss'] = np.nan
             # calculate volatility column with appropriate lag
             if 'volatility' not in df.columns:
                 df.loc[:, 'volatility'] = df[self.price_label].shift().rolling(self.volatility_lb).std()
                 df['volatility'].fillna(0, inplace=True)
-            _signals[k] = df.to_dict()
+            frames[k] = df
+        self._index = pd.DatetimeIndex(sorted(set().union(*(df.index for df in frames.values()))))
+        # sessions as 'YYYY-MM-DD' strings, used in transaction ids and logs
+        self._ds_str = self._index.strftime('%Y-%m-%d').to_numpy()
+        # positions of every symbol's sessions in the shared index
+        self._symbol_rows = [self._index.get_indexer(df.index) for df in frames.values()]
+        self._symbols = np.array(list(frames), dtype=object)
+        self._symbol_idx = {sym: j for j, sym in enumerate(self._symbols)}
+        self._entry_long = self._signal_matrix(frames, 'entry_long')
+        self._exit_long = self._signal_matrix(frames, 'exit_long')
+        self._entry_short = self._signal_matrix(frames, 'entry_short')
+        self._exit_short = self._signal_matrix(frames, 'exit_short')
+        price = self._signal_matrix(frames, self.price_label, dtype=np.float64, fill_value=np.nan)
+        # symbol is available in given session if it has a price
+        self._presence = ~np.isnan(price)
+        self._next_present = self._next_present_rows(self._presence)
+        # prices used for valuation of owned shares. If symbol is not available in given session its
+        # last known price is used.
+        self._price_matrix = pd.DataFrame(price).ffill().fillna(0).to_numpy()
+        if self._dbg:
+            self._log_filled_prices()
+        self._stop_loss = self._signal_matrix(frames, 'stop_loss', dtype=np.float64, fill_value=np.nan)
+        self._volatility = self._signal_matrix(frames, 'volatility', dtype=np.float64, fill_value=np.nan)
+        if (self.stop_loss == True) or (self.auto_stop_loss != False):
+            self._low = self._signal_matrix(frames, self.low_label, dtype=np.float64, fill_value=np.nan)
+            self._high = self._signal_matrix(frames, self.high_label, dtype=np.float64, fill_value=np.nan)
+        else:
+            # not used without stop loss
+            self._low = self._high = self._price_matrix
         self.log.debug('Signals ready.')
-        return _signals
+
+    def _log_filled_prices(self):
+        """Logs how many sessions of each symbol are priced with forward-filled (last known) price."""
+        # sessions between first and last available one, when symbol was not available
+        after_first = np.maximum.accumulate(self._presence, axis=0)
+        before_last = np.maximum.accumulate(self._presence[::-1], axis=0)[::-1]
+        listed = after_first & before_last
+        filled = (listed & ~self._presence).sum(axis=0)
+        if filled.any():
+            self.log.debug('Missing prices forward-filled: {}'.format(
+                ', '.join('{}={}'.format(sym, cnt) for sym, cnt in zip(self._symbols, filled) if cnt)
+            ))
+
+    def _signal_matrix(self, signals, column, dtype=np.int8, fill_value=0):
+        """
+        Returns (dates x symbols) matrix with *column* values of all *signals*. Days when symbol
+        is not available are set to *fill_value*.
+        """
+        matrix = np.full((len(self._index), len(signals)), fill_value, dtype=dtype)
+        for j, df in enumerate(signals.values()):
+            matrix[self._symbol_rows[j], j] = df[column].fillna(fill_value).to_numpy()
+        return matrix
+
+    def _next_present_rows(self, present):
+        """
+        For each (day, symbol) returns row index of the next day when symbol is available.
+        If there is no such day, number of all days is set.
+        """
+        n_days = present.shape[0]
+        rows = np.where(present, np.arange(n_days)[:, None], n_days)
+        first_from = np.minimum.accumulate(rows[::-1], axis=0)[::-1]
+        return np.vstack([first_from[1:], np.full((1, present.shape[1]), n_days)])
 
     def _reset_backtest_state(self):
         """
         Resets/Initializes all attributes used during backtest run.
         """
         self._owned_shares = {}
-        self._available_money = self.init_capital
+        self._owned_side = np.zeros(len(self._symbols), dtype=np.int8)
+        self._owned_cnt = np.zeros(len(self._symbols))
+        # money is kept in integer cents, it's converted to float only in outputs (see `_available_money`)
+        self._available_cents = _to_cents(self.init_capital)
         self._money_from_short = {}
-        self._trades = {}
+        # sum of `_money_from_short` values, maintained on every short entry/exit
+        self._money_from_short_total = 0
+        # trades are stored as parallel arrays, row is trade's (int) transaction id. Arrays are grown
+        # when full (see `_grow_trades`), `_n_trades` is number of used rows
+        size = max(len(self._index), 16)
+        self._n_trades = 0
+        self._trade_symbol = np.zeros(size, dtype=np.int32)
+        self._trade_type = np.zeros(size, dtype=np.int8)  # _LONG or _SHORT
+        self._trade_buy_i = np.zeros(size, dtype=np.int32)
+        self._trade_sell_i = np.full(size, -1, dtype=np.int32)  # -1 - trade not closed
+        # values in cents
+        self._trade_buy_val = np.zeros(size, dtype=np.int64)
+        self._trade_buy_val_fee = np.zeros(size, dtype=np.int64)
+        self._trade_sell_val = np.zeros(size, dtype=np.int64)
+        self._trade_sell_val_fee = np.zeros(size, dtype=np.int64)
+        self._trade_profit = np.zeros(size, dtype=np.int64)
         self._account_value = {}
         self._net_account_value = {}
         self._rate_of_return = {}
-        self._backup_prices = {}
         self._auto_stop_loss_tracker = {}
 
-    def _sell(self, symbol, price, ds, exit_type):
+    def _grow_trades(self):
+        """Doubles size of arrays with trades."""
+        size = 2 * len(self._trade_symbol)
+        for attr in ('_trade_symbol', '_trade_type', '_trade_buy_i', '_trade_buy_val', '_trade_buy_val_fee',
+                     '_trade_sell_val', '_trade_sell_val_fee', '_trade_profit'):
+            setattr(self, attr, np.resize(getattr(self, attr), size))
+        sell_i = np.full(size, -1, dtype=np.int32)
+        sell_i[:self._n_trades] = self._trade_sell_i[:self._n_trades]
+        self._trade_sell_i = sell_i
+
+    def _trade_id(self, t):
+        """Returns string id of t-th trade: 'YYYY-MM-DD_SYMBOL_type' (buy session, symbol and entry type)."""
+        return '_'.join((
+            self._ds_str[self._trade_buy_i[t]],
+            self._symbols[self._trade_symbol[t]],
+            _ENTRY_TYPES[self._trade_type[t]],
+        ))
+
+    def _trades_output(self):
+        """
+        Builds dictionary with trades made during backtest: transaction id -> trade details. Trades are
+        ordered by buy time.
+        """
+        trades = {}
+        for t in range(self._n_trades):
+            trade = {
+                'buy_ds': self._index[self._trade_buy_i[t]],
+                'type': _ENTRY_TYPES[self._trade_type[t]],
+                'trx_value_no_fee': self._trade_buy_val[t] / 100,
+                'trx_value_with_fee': self._trade_buy_val_fee[t] / 100,
+            }
+            if self._trade_sell_i[t] != -1:
+                trade.update({
+                    'sell_ds': self._index[self._trade_sell_i[t]],
+                    'sell_value_no_fee': self._trade_sell_val[t] / 100,
+                    'sell_value_with_fee': self._trade_sell_val_fee[t] / 100,
+                    'profit': self._trade_profit[t] / 100,
+                })
+            trades[self._trade_id(t)] = trade
+        return trades
+
+    def _sell(self, symbol, price, i, exit_type, fee):
         """Selling procedure"""
         shares_count = self._owned_shares[symbol]['cnt']
-        fee = self.position_sizer.calculate_fee(abs(shares_count)*price)
-        trx_value = (abs(shares_count)*price)
+        # money values below are in cents
+        fee = _to_cents(fee)
+        trx_value = _to_cents(abs(shares_count)*price)
         
         trx_id = self._owned_shares[symbol]['trx_id']
 
-        self.log.debug('\t\tSelling {} (Transaction id: {})'.format(symbol, trx_id))
-        self.log.debug('\t\t\tNo. of sold shares: ' + str(int(shares_count)))
-        self.log.debug('\t\t\tSell price: ' + str(price))
-        self.log.debug('\t\t\tFee: ' + str(fee))
-        self.log.debug('\t\t\tTransaction value (no fee): ' + str(trx_value))
-        self.log.debug('\t\t\tTransaction value (gross): ' + str(trx_value - fee))
+        if self._dbg:
+            self.log.debug('\t\tSelling {} (Transaction id: {})'.format(symbol, self._trade_id(trx_id)))
+            self.log.debug('\t\t\tNo. of sold shares: ' + str(int(shares_count)))
+            self.log.debug('\t\t\tSell price: ' + str(price))
+            self.log.debug('\t\t\tFee: ' + str(fee / 100))
+            self.log.debug('\t\t\tTransaction value (no fee): ' + str(trx_value / 100))
+            self.log.debug('\t\t\tTransaction value (gross): ' + str((trx_value - fee) / 100))
 
-        buy_trx_value_with_fee = self._trades[trx_id]['trx_value_with_fee']
+        buy_trx_value_with_fee = int(self._trade_buy_val_fee[trx_id])
         
         if exit_type == 'long':
             sell_trx_value_with_fee = trx_value - fee
             profit = sell_trx_value_with_fee - buy_trx_value_with_fee
-            self._available_money += sell_trx_value_with_fee
+            self._available_cents += sell_trx_value_with_fee
         elif exit_type == 'short':
             sell_trx_value_with_fee = trx_value + fee
             profit = buy_trx_value_with_fee - sell_trx_value_with_fee
-            self._available_money += self._money_from_short[trx_id]
-            self._money_from_short.pop(trx_id)
-            self._available_money -= sell_trx_value_with_fee
+            money_from_short = self._money_from_short.pop(trx_id)
+            self._money_from_short_total -= money_from_short
+            self._available_cents += money_from_short
+            self._available_cents -= sell_trx_value_with_fee
   
-        self.log.debug('\t\tAvailable money after selling: ' + str(self._available_money))
+        if self._dbg:
+            self.log.debug('\t\tAvailable money after selling: ' + str(self._available_money))
         
-        self._trades[trx_id].update({
-            'sell_ds': ds,
-            'sell_value_no_fee': trx_value,
-            'sell_value_with_fee': sell_trx_value_with_fee,
-            'profit': round(profit, 2)
-        })
+        self._trade_sell_i[trx_id] = i
+        self._trade_sell_val[trx_id] = trx_value
+        self._trade_sell_val_fee[trx_id] = sell_trx_value_with_fee
+        self._trade_profit[trx_id] = profit
         self._owned_shares.pop(symbol)
+        self._owned_side[self._symbol_idx[symbol]] = 0
+        self._owned_cnt[self._symbol_idx[symbol]] = 0
 
-    def _buy(self, trx, ds):
+    def _buy(self, sym_idx, entry_type_code, price, shares_count, trx_value, fee, i):
         """Buying procedure"""
-        if self._owned_shares.get(trx['symbol']):
+        symbol = self._symbols[sym_idx]
+        if self._owned_shares.get(symbol):
             raise ValueError(
                 '[{}] Trying to buy {} of {}. You currenlty own this symbol.\
                 Buying additional/partial selling is currently not supported'.format(
-                    ds, trx['entry_type'], trx['symbol']
+                    self._index[i], _ENTRY_TYPES[entry_type_code], symbol
                 )
             )
-        if trx['shares_count'] == 0:
+        if shares_count == 0:
             raise ValueError(
                 f'Trying to buy 0 shares. It should not be possible'
             )
 
-        trx_id = '_'.join((str(ds)[:10], trx['symbol'], trx['entry_type']))
-        self.log.debug('\t\tBuying {} (Transaction id: {})'.format(trx['symbol'], trx_id))
+        if self._n_trades == len(self._trade_symbol):
+            self._grow_trades()
+        trx_id = self._n_trades
+        self._n_trades += 1
+        if self._dbg:
+            self.log.debug('\t\tBuying {} (Transaction id: {})'.format(
+                symbol, '_'.join((self._ds_str[i], symbol, _ENTRY_TYPES[entry_type_code]))
+            ))
         
-        if trx['entry_type'] == 'long':
-            trx_value_with_fee = trx['trx_value'] + trx['fee'] # i need to spend
-            self._owned_shares[trx['symbol']] = {'cnt': trx['shares_count']}
-            self._available_money -= trx_value_with_fee
-                    
-        elif trx['entry_type'] == 'short':
-            trx_value_with_fee = trx['trx_value'] - trx['fee'] # i will get
-            self._owned_shares[trx['symbol']] = {'cnt': -trx['shares_count']}
-            self._available_money -= trx['fee']
-            self._money_from_short[trx_id] = trx['trx_value']
-
-        self._available_money = round(self._available_money, 2)
-
-        self._owned_shares[trx['symbol']]['trx_id'] = trx_id
-        self._trades[trx_id] = {
-            'buy_ds': ds,
-            'type': trx['entry_type'],
-            'trx_value_no_fee': trx['trx_value'],
-            'trx_value_with_fee': trx_value_with_fee,
-        }
-
-        self.log.debug('\t\t\tNo. of bought shares: ' + str(int(trx['shares_count'])))
-        self.log.debug('\t\t\tBuy price: ' + str(trx['price']))
-        self.log.debug('\t\t\tFee: ' + str(trx['fee']))
-        self.log.debug('\t\t\tTransaction value (no fee): ' + str(trx['trx_value']))
-        self.log.debug('\t\t\tTransaction value (gross): ' + str(trx_value_with_fee))
-        self.log.debug('\t\tAvailable money after buying: ' + str(self._available_money))
-        if trx['entry_type'] == 'short':
-            self.log.debug('\t\tMoney from short sell: ' + str(self._money_from_short[trx_id]))
+        # money values below are in cents
+        fee = _to_cents(fee)
+        trx_value = _to_cents(trx_value)
+        if entry_type_code == _LONG:
+            trx_value_with_fee = trx_value + fee # i need to spend
+            self._owned_shares[symbol] = {'cnt': shares_count}
+            self._owned_side[sym_idx] = 1
+            self._available_cents -= trx_value_with_fee
+        else:
+            trx_value_with_fee = trx_value - fee # i will get
+            self._owned_shares[symbol] = {'cnt': -shares_count}
+            self._owned_side[sym_idx] = -1
+            self._available_cents -= fee
+            self._money_from_short[trx_id] = trx_value
+            self._money_from_short_total += trx_value
+
+        self._owned_shares[symbol]['trx_id'] = trx_id
+        self._owned_cnt[sym_idx] = self._owned_shares[symbol]['cnt']
+        self._trade_symbol[trx_id] = sym_idx
+        self._trade_type[trx_id] = entry_type_code
+        self._trade_buy_i[trx_id] = i
+        self._trade_buy_val[trx_id] = trx_value
+        self._trade_buy_val_fee[trx_id] = trx_value_with_fee
+
+        if self._dbg:
+            self.log.debug('\t\t\tNo. of bought shares: ' + str(int(shares_count)))
+            self.log.debug('\t\t\tBuy price: ' + str(price))
+            self.log.debug('\t\t\tFee: ' + str(fee / 100))
+            self.log.debug('\t\t\tTransaction value (no fee): ' + str(trx_value / 100))
+            self.log.debug('\t\t\tTransaction value (gross): ' + str(trx_value_with_fee / 100))
+            self.log.debug('\t\tAvailable money after buying: ' + str(self._available_money))
+            if entry_type_code == _SHORT:
+                self.log.debug('\t\tMoney from short sell: ' + str(self._money_from_short[trx_id] / 100))
+
+    def _buy_orders(self, available_money, capital, cand_idx, cand_codes, prices, volatility, stop_loss):
+        """
+        Asks position sizer what to buy from purchease candidates (*cand_idx* symbols with *cand_codes*
+        entry types). Returns tuple of buy orders: (candidate position, shares count, transaction value, fee),
+        in order of buying.
+        """
+        to_buy, shares_count, fees, trx_values = self.position_sizer.decide_batch(
+            available_money,
+            self._symbols[cand_idx],
+            prices,
+            _ENTRY_TYPES[cand_codes],
+            capital=capital,
+            volatility=volatility,
+            stop_loss=stop_loss,
+        )
+        return tuple(zip(to_buy.tolist(), shares_count.tolist(), trx_values.tolist(), fees.tolist()))
 
-    def _define_candidate(self, price, symbol, ds, entry_type):
+    def _candidates_stop_loss(self, i, cand_idx, prices, entry_type_codes):
         """
-        Reutrns dictionary with purchease candidates and necessery keys.
-        Handles setting up value for auto_stop_loss.
+        Returns stop losses of purchease candidates (*cand_idx* symbols in i-th session) or None if stop
+        loss is not used. Handles setting up value for auto_stop_loss.
         """
         if self.auto_stop_loss != False:
-            stop_loss = self._calc_auto_sl(price, entry_type)
+            return self._calc_auto_sl(prices, entry_type_codes)
         elif self.stop_loss:
-            stop_loss = self.signals[symbol].get('stop_loss', None)      
-        else:
-            stop_loss = None
-        return self.position_sizer.define_candidate(
-            symbol=symbol,
-            entry_type=entry_type,
-            price=price,
-            stop_loss=stop_loss,
-        )
+            return self._stop_loss[i, cand_idx]
+        return None
+
+    def _calc_auto_sl(self, price, entry_type_code):
+        """Returns auto stop loss for *price* and *entry_type_code* (both can be scalars or numpy arrays)."""
+        offset = price*self.auto_stop_loss
+        return np.where(entry_type_code == _LONG, price - offset, price + offset)
 
-    def _calc_auto_sl(self, price, entry_type):
-        if entry_type == 'long':
-            return price - (price*self.auto_stop_loss)
-        elif entry_type == 'short':
-            return price + (price*self.auto_stop_loss)
+    def _calculate_account_value(self, i):
+        return float(self._owned_cnt @ self._price_matrix[i])
 
-    def _calculate_account_value(self, ds):
-        _account_value = 0
-        for symbol, vals in self._owned_shares.items():
-            _account_value += vals['cnt'] * self._get_price(symbol, ds)
-        return _account_value
+    @property
+    def _available_money(self):
+        return self._available_cents / 100
 
     def _get_money_from_short(self):
-        return sum([m for m in self._money_from_short.values()])
+        return self._money_from_short_total / 100
 
-    def _get_price(self, symbol, ds, label=None):
+    def _get_price(self, symbol, i):
         """
-        Do not use directly. If ds is not available it uses backup price. This backup price may not be
-        avialable. As its being constantly overwritten it also depends on backtest execution.
+        Returns *symbol* price in i-th session. If session is not available for *symbol*, its last known
+        price is returned (0 before first available session).
         """
-        if label == None:
-            label = self.price_label
-        price = self.signals[symbol][label].get(ds)
-        if price == None:
-            price = self._backup_prices[symbol][0]
-        return price
-
-    def _update_auto_stop_loss(self, symbol, price, cur_ds, next_ds):
+        return float(self._price_matrix[i, self._symbol_idx[symbol]])
+
+    def _update_auto_stop_loss(self, symbol, j, price, cur_i, next_i):
         """
         curr_sl_ref_price is the price from which actual SL was calculated. It's not SL itself.
         Also, note that SL is set up for ds+1 day.
         """
-        if self._owned_shares[symbol]['cnt'] > 0:
-            entry_type = 'long'
-        else:
-            entry_type = 'short'
+        entry_type_code = _LONG if self._owned_shares[symbol]['cnt'] > 0 else _SHORT
         curr_sl_ref_price = self._auto_stop_loss_tracker.get(symbol, 0)
         if price > curr_sl_ref_price:
             self._auto_stop_loss_tracker[symbol] = price
-            stop_loss = self._calc_auto_sl(price, entry_type)
+            stop_loss = float(self._calc_auto_sl(price, entry_type_code))
         else:
-            stop_loss = self.signals[symbol]['stop_loss'][cur_ds]
-        self.signals[symbol]['stop_loss'][next_ds] = stop_loss
+            stop_loss = self._stop_loss[cur_i, j]
+        self._stop_loss[next_i, j] = stop_loss
         return stop_loss
 
-    def _summarize_day(self, ds):
+    def _summarize_day(self, i, ds):
         """Sets up summaries after finished session day."""
-        self.log.debug('[ SUMMARIZE SESSION {} ]'.format(str(ds)[:10]))
-        _account_value = self._calculate_account_value(ds)
+        if self._dbg:
+            self.log.debug('[ SUMMARIZE SESSION {} ]'.format(self._ds_str[i]))
+        _account_value = self._calculate_account_value(i)
         # account value (can be negative) + avaiable money + any borrowed moneny
         nav = _account_value + self._available_money + self._get_money_from_short()
         self._account_value[ds] = _account_value
         self._net_account_value[ds] = nav
         self._rate_of_return[ds] = ((nav-self.init_capital)/self.init_capital)*100
 
-        self.log.debug('Available money is: ' + str(self._available_money))
-        self.log.debug('Shares: ' + ', '.join(sorted(['{}: {}'.format(k, v['cnt']) for k,v in self._owned_shares.items()])))
-        self.log.debug('Net Account Value is: ' + str(nav))
-        self.log.debug('Rate of return: ' + str(self._rate_of_return[ds]))
+        if self._dbg:
+            self.log.debug('Available money is: ' + str(self._available_money))
+            self.log.debug('Shares: ' + ', '.join(sorted(['{}: {}'.format(k, v['cnt']) for k,v in self._owned_shares.items()])))
+            self.log.debug('Net Account Value is: ' + str(nav))
+            self.log.debug('Rate of return: ' + str(self._rate_of_return[ds]))
 
     def _run_output(self):
         """
         Aggregates results from backtester run and outputs it as a DataFrame
         """
-        df = pd.DataFrame()
-        idx = list(self._account_value.keys())
-        results = (
-            (self._account_value, 'account_value'),
-            (self._net_account_value, 'nav'),
-            (self._rate_of_return, 'rate_of_return')
-        )
-        for d, col in results:
-            temp_df = pd.DataFrame(list(d.items()), index=idx, columns=['ds', col])
-            temp_df.drop('ds', axis=1, inplace=True)
-            df = pd.concat([df, temp_df], axis=1)
-        return df
+        return pd.DataFrame({
+            'account_value': self._account_value,
+            'nav': self._net_account_value,
+            'rate_of_return': self._rate_of_return,
+        })
 
 
 class SimpleBacktest():
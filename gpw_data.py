@@ -1,6 +1,8 @@
 # built in
+from concurrent.futures import ThreadPoolExecutor
 import csv
 import os
+import threading
 import time
 
 # 3rd party
@@ -11,11 +13,33 @@ import numpy as np
 from price_collector import PriceCollector
 
 
+class _RateLimiter():
+    """
+    Spaces out calls of `wait` by at least *interval* seconds. Shared by all threads using it.
+    """
+    def __init__(self, interval):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._next_call = 0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = max(self._next_call - now, 0)
+            self._next_call = max(self._next_call, now) + self.interval
+        time.sleep(delay)
+
+
 class GPWData():
     def __init__(self, pricing_data_path='./pricing_data'):
         self.pricing_data_path = pricing_data_path
+        self._path_tmpl = os.path.join(pricing_data_path, '{}_pricing.csv')
         self.collector = PriceCollector()
         self.column_names = ['date', 'open', 'high', 'low', 'close', 'volume']
+        self.column_dtypes = {
+            'date': str, 'open': np.float64, 'high': np.float64, 'low': np.float64, 'close': np.float64,
+            'volume': np.int64
+        }
         self.indicies_stocks = {
             'WIG20': ['ALIOR', 'ASSECOPOL', 'SANPL', 'CCC', 'CYFRPLSAT', 'CDPROJEKT', 'ENERGA',
                       'PLAY', 'KGHM', 'LOTOS', 'LPP', 'MBANK', 'ORANGEPL', 'PEKAO',
@@ -30,20 +54,18 @@ class GPWData():
             ]
         }
 
-    def download_data_to_csv(self, symbols=None):
+    def download_data_to_csv(self, symbols=None, max_workers=4, requests_interval=0.5):
         """
         Collects historical data and outputs csv file in *pricing_data_path*. Currently it takes
         full history until execution and its overwriting files.
+
+        Symbols are downloaded in *max_workers* threads. Requests are started at least
+        *requests_interval* seconds one after another.
         """
-        for symbol in symbols:
-            print('Downloading {}'.format(symbol))
-            pricing_data = self.collector.get_historical_data(symbol)
-            with open(self._output_path(symbol), 'w') as fh:
-                writer = csv.writer(fh)
-                writer.writerow(self.column_names)
-                for date, prices in pricing_data.items():
-                    writer.writerow([date] + prices)
-            time.sleep(0.5)
+        rate_limiter = _RateLimiter(requests_interval)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # list() re-raises exceptions from threads
+            list(executor.map(lambda symbol: self._download_symbol(symbol, rate_limiter), symbols))
 
     def load(self, symbols=None, etfs=None, index=None, df=True, from_csv=True):
         """
@@ -62,26 +84,22 @@ class GPWData():
         pricing_data = {}
         for symbol in symbols:
             if from_csv:
-                with open(self._output_path(symbol), 'r') as fh:
-                    reader = csv.reader(fh)
-                    next(reader)  # skip the header
-                    data = [
-                        [row[0], float(row[1]), float(row[2]), float(row[3]), float(row[4]), int(row[5])]
-                        for row in reader
-                    ]
+                data = pd.read_csv(self._output_path(symbol), dtype=self.column_dtypes)
             else:
                 data_dict = self.collector.get_historical_data(symbol)
-                data = [[date] + prices for date, prices in data_dict.items()]
-            # load to DataFrame to fill missing data-points
+                data = pd.DataFrame(
+                    [[date] + prices for date, prices in data_dict.items()], columns=self.column_names
+                )
+            # fill missing data-points (zeros) with previous value
             date_col = self.column_names[0]
-            data = pd.DataFrame(data, columns=self.column_names)
-            data.replace(to_replace=0, value=np.nan, inplace=True)
-            data.fillna(method='ffill', inplace=True)
+            price_cols = self.column_names[1:]
+            prices = data[price_cols]
+            data[price_cols] = prices.mask(prices == 0).ffill()
             # (back) to desired output format
             if df:
+                data[date_col] = pd.to_datetime(data[date_col])
+                data.set_index(date_col, inplace=True)
                 data.name=symbol
-                data.set_index(pd.DatetimeIndex(data[date_col]), inplace=True)
-                data.drop(date_col, axis=1, inplace=True)
             else:
                 data = data.values.tolist()
             pricing_data[symbol] = data
@@ -149,8 +167,17 @@ class GPWData():
         elif type_ == 'index':
             return self.indicies_stocks[index]
 
+    def _download_symbol(self, symbol, rate_limiter):
+        rate_limiter.wait()
+        print('Downloading {}'.format(symbol))
+        pricing_data = self.collector.get_historical_data(symbol)
+        with open(self._output_path(symbol), 'w', newline='', buffering=1<<20) as fh:
+            writer = csv.writer(fh)
+            writer.writerow(self.column_names)
+            writer.writerows([date] + prices for date, prices in pricing_data.items())
+
     def _output_path(self, symbol):
-        return os.path.join(self.pricing_data_path, '{}_pricing.csv'.format(symbol))
+        return self._path_tmpl.format(symbol)
 
 
 def main():
@@ -36,7 +36,41 @@ class PositionSize(metaclass=ABCMeta):
         if fee < self.min_fee:
             fee = self.min_fee
         return round(fee, 2)
-    
+
+    def calculate_fee_batch(self, transaction_values):
+        """Calculates expected transaction fees for numpy array of *transaction_values*."""
+        return numpy.array([self.calculate_fee(value) for value in transaction_values.tolist()])
+
+    def decide_batch(self, available_money_at_time, symbols, prices, entry_types, capital=None, volatility=None,
+                     stop_loss=None):
+        """
+        Array version of `decide_what_to_buy`. Candidates are given as aligned arrays: *symbols*, *prices*,
+        *entry_types* and optionally *volatility* and *stop_loss* (None if stop loss is not used).
+        Returns positions of candidates to buy (in order of buying) and aligned to them float arrays: shares
+        count, fee and transaction value. By default it delegates to `decide_what_to_buy`.
+        """
+        n = len(symbols)
+        if n == 0:
+            return numpy.zeros(0, dtype=int), numpy.zeros(0), numpy.zeros(0), numpy.zeros(0)
+        symbols = list(symbols)
+        stop_losses = [None]*n if stop_loss is None else numpy.asarray(stop_loss, dtype=float).tolist()
+        candidates = [
+            self.define_candidate(symbol=sym, entry_type=entry_type, price=price, stop_loss=sl)
+            for sym, entry_type, price, sl in zip(symbols, entry_types, numpy.asarray(prices).tolist(), stop_losses)
+        ]
+        if volatility is not None:
+            volatility = dict(zip(symbols, numpy.asarray(volatility).tolist()))
+        symbols_to_buy = self.decide_what_to_buy(
+            available_money_at_time, candidates, capital=capital, volatility=volatility or {},
+        )
+        position = {sym: k for k, sym in enumerate(symbols)}
+        return (
+            numpy.array([position[trx['symbol']] for trx in symbols_to_buy], dtype=int),
+            numpy.array([trx['shares_count'] for trx in symbols_to_buy], dtype=float),
+            numpy.array([trx['fee'] for trx in symbols_to_buy], dtype=float),
+            numpy.array([trx['trx_value'] for trx in symbols_to_buy], dtype=float),
+        )
+
     def sort(self, candidates, volatility={}, rrr=None):
         _candidates = candidates.copy()
         if self.sort_type == 'alphabetically':
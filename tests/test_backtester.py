@@ -200,6 +200,19 @@ def fixed_capital_perc_sizer(capital_perc):
     return FixedCapitalPerc(capital_perc=capital_perc)
 
 
+def owned_shares(backtester):
+    """Returns owned shares of *backtester* with string transaction ids."""
+    return {
+        symbol: {'cnt': details['cnt'], 'trx_id': backtester._trade_id(details['trx_id'])}
+        for symbol, details in backtester._owned_shares.items()
+    }
+
+
+def money_from_short(backtester):
+    """Returns money from short sells of *backtester* with string transaction ids (money is kept in cents)."""
+    return {backtester._trade_id(t): cents / 100 for t, cents in backtester._money_from_short.items()}
+
+
 @pytest.fixture(params=['signals', 'position_sizer', 'init_capital'])
 def backtester(request):
     """
@@ -254,8 +267,8 @@ def test_functional_backtester_1_day_TEST_SIGS_1(backtester):
     assert(backtester._available_money == expected_available_money)
     assert(backtester._account_value[ds_key] == expected_account_value)
     assert(backtester._net_account_value[ds_key] == expected_nav)
-    assert(backtester._owned_shares == expected_owned_shares)
-    assert(backtester._money_from_short == {})
+    assert(owned_shares(backtester) == expected_owned_shares)
+    assert(money_from_short(backtester) == {})
 
 
 @pytest.mark.parametrize('backtester', [(signals_test_sigs_1(), max_first_encountered_alpha_sizer(), 500)], indirect=True)
@@ -268,8 +281,8 @@ def test_functional_backtester_2_days_TEST_SIGS_1(backtester):
     assert(backtester._available_money == expected_available_money)
     assert(backtester._account_value[ds_key] == expected_account_value)
     assert(backtester._net_account_value[ds_key] == expected_nav)
-    assert(backtester._owned_shares == {})
-    assert(backtester._money_from_short == {})
+    assert(owned_shares(backtester) == {})
+    assert(money_from_short(backtester) == {})
 
 
 @pytest.mark.parametrize('backtester', [(signals_test_sigs_1(), max_first_encountered_alpha_sizer(), 500)], indirect=True)
@@ -291,8 +304,8 @@ def test_functional_backtester_3_days_TEST_SIGS_1(backtester):
     assert(backtester._available_money == expected_available_money)
     assert(backtester._account_value[ds_key] == expected_account_value)
     assert(backtester._net_account_value[ds_key] == expected_nav)
-    assert(backtester._owned_shares == expected_owned_shares)
-    assert(backtester._money_from_short == expected_money_from_short)
+    assert(owned_shares(backtester) == expected_owned_shares)
+    assert(money_from_short(backtester) == expected_money_from_short)
 
 
 @pytest.mark.parametrize('backtester', [(signals_test_sigs_1(), max_first_encountered_alpha_sizer(), 500)], indirect=True)
@@ -305,8 +318,8 @@ def test_functional_backtester_4_days_TEST_SIGS_1(backtester):
     assert(backtester._available_money == expected_available_money)
     assert(backtester._account_value[ds_key] == expected_account_value)
     assert(backtester._net_account_value[ds_key] == expected_nav)
-    assert(backtester._owned_shares == {})
-    assert(backtester._money_from_short == {})
+    assert(owned_shares(backtester) == {})
+    assert(money_from_short(backtester) == {})
 
 
 @pytest.mark.parametrize('backtester', [(signals_test_sigs_1(), max_first_encountered_alpha_sizer(), 500)], indirect=True)
@@ -356,8 +369,8 @@ def test_functional_backtester_1_day_TEST_SIGS_2(backtester):
     assert(backtester._available_money == expected_available_money)
     assert(backtester._account_value[ds_key] == expected_account_value)
     assert(backtester._net_account_value[ds_key] == expected_nav)
-    assert(backtester._owned_shares == expected_owned_shares)
-    assert(backtester._money_from_short == expected_money_from_short)
+    assert(owned_shares(backtester) == expected_owned_shares)
+    assert(money_from_short(backtester) == expected_money_from_short)
 
 
 @pytest.mark.parametrize('backtester', [(signals_test_sigs_2(), fixed_capital_perc_sizer(0.2), 1000000)], indirect=True)
@@ -383,8 +396,8 @@ def test_functional_backtester_2_days_TEST_SIGS_2(backtester):
     assert(backtester._available_money == expected_available_money)
     assert(backtester._account_value[ds_key] == expected_account_value)
     assert(backtester._net_account_value[ds_key] == expected_nav)
-    assert(backtester._owned_shares == expected_owned_shares)
-    assert(backtester._money_from_short == expected_money_from_short)
+    assert(owned_shares(backtester) == expected_owned_shares)
+    assert(money_from_short(backtester) == expected_money_from_short)
 
 
 @pytest.mark.parametrize('backtester', [(signals_test_sigs_2(), fixed_capital_perc_sizer(0.2), 1000000)], indirect=True)
@@ -404,8 +417,8 @@ def test_functional_backtester_3_days_TEST_SIGS_2(backtester):
     assert(backtester._available_money == expected_available_money)
     assert(backtester._account_value[ds_key] == expected_account_value)
     assert(backtester._net_account_value[ds_key] == expected_nav)
-    assert(backtester._owned_shares == expected_owned_shares)
-    assert(backtester._money_from_short == expected_money_from_short)
+    assert(owned_shares(backtester) == expected_owned_shares)
+    assert(money_from_short(backtester) == expected_money_from_short)
 
 
 @pytest.mark.parametrize('backtester', [(signals_test_sigs_2(), fixed_capital_perc_sizer(0.2), 1000000)], indirect=True)
@@ -418,8 +431,8 @@ def test_functional_backtester_4_days_TEST_SIGS_2(backtester):
     assert(backtester._available_money == expected_available_money)
     assert(backtester._account_value[ds_key] == expected_account_value)
     assert(backtester._net_account_value[ds_key] == expected_nav)
-    assert(backtester._owned_shares == {})
-    assert(backtester._money_from_short == {})
+    assert(owned_shares(backtester) == {})
+    assert(money_from_short(backtester) == {})
 
 
 @pytest.mark.parametrize('backtester', [(signals_test_sigs_2(), fixed_capital_perc_sizer(0.2), 1000000)], indirect=True)
@@ -473,8 +486,8 @@ def test_functional_backtester_1_day_TEST_SIGS_3(backtester):
     assert(backtester._available_money == expected_available_money)
     assert(backtester._account_value[ds_key] == expected_account_value)
     assert(backtester._net_account_value[ds_key] == expected_nav)
-    assert(backtester._owned_shares == expected_owned_shares)
-    assert(backtester._money_from_short == {})
+    assert(owned_shares(backtester) == expected_owned_shares)
+    assert(money_from_short(backtester) == {})
 
 
 @pytest.mark.parametrize('backtester', [(signals_test_sigs_3(), fixed_capital_perc_sizer(0.35), 400000)], indirect=True)
@@ -500,8 +513,8 @@ def test_functional_backtester_2_days_TEST_SIGS_3(backtester):
     assert(backtester._available_money == expected_available_money)
     assert(backtester._account_value[ds_key] == expected_account_value)
     assert(backtester._net_account_value[ds_key] == expected_nav)
-    assert(backtester._owned_shares == expected_owned_shares)
-    assert(backtester._money_from_short == expected_money_from_short)
+    assert(owned_shares(backtester) == expected_owned_shares)
+    assert(money_from_short(backtester) == expected_money_from_short)
 
 
 @pytest.mark.parametrize('backtester', [(signals_test_sigs_3(), fixed_capital_perc_sizer(0.35), 400000)], indirect=True)
@@ -528,8 +541,8 @@ def test_functional_backtester_3_days_TEST_SIGS_3(backtester):
     assert(backtester._available_money == expected_available_money)
     assert(backtester._account_value[ds_key] == expected_account_value)
     assert(backtester._net_account_value[ds_key] == expected_nav)
-    assert(backtester._owned_shares == expected_owned_shares)
-    assert(backtester._money_from_short == {})
+    assert(owned_shares(backtester) == expected_owned_shares)
+    assert(money_from_short(backtester) == {})
 
 
 @pytest.mark.parametrize('backtester', [(signals_test_sigs_3(), fixed_capital_perc_sizer(0.35), 400000)], indirect=True)
@@ -556,8 +569,8 @@ def test_functional_backtester_4_days_TEST_SIGS_3(backtester):
     assert(backtester._available_money == expected_available_money)
     assert(backtester._account_value[ds_key] == expected_account_value)
     assert(backtester._net_account_value[ds_key] == expected_nav)
-    assert(backtester._owned_shares == expected_owned_shares)
-    assert(backtester._money_from_short == {})
+    assert(owned_shares(backtester) == expected_owned_shares)
+    assert(money_from_short(backtester) == {})
 
 
 @pytest.mark.parametrize('backtester', [(signals_test_sigs_3(), fixed_capital_perc_sizer(0.35), 400000)], indirect=True)
@@ -580,8 +593,8 @@ def test_functional_backtester_5_days_TEST_SIGS_3(backtester):
     assert(backtester._available_money == expected_available_money)
     assert(backtester._account_value[ds_key] == expected_account_value)
     assert(backtester._net_account_value[ds_key] == expected_nav)
-    assert(backtester._owned_shares == expected_owned_shares)
-    assert(backtester._money_from_short == {})
+    assert(owned_shares(backtester) == expected_owned_shares)
+    assert(money_from_short(backtester) == {})
 
 
 @pytest.mark.parametrize('backtester', [(signals_test_sigs_3(), fixed_capital_perc_sizer(0.35), 400000)], indirect=True)
@@ -640,8 +653,8 @@ def test_functional_backtester_1_day_TEST_SL_1(backtester_sl):
     assert(backtester_sl._available_money == expected_available_money)
     assert(backtester_sl._account_value[ds_key] == expected_account_value)
     assert(backtester_sl._net_account_value[ds_key] == expected_nav)
-    assert(backtester_sl._owned_shares == expected_owned_shares)
-    assert(backtester_sl._money_from_short == {})
+    assert(owned_shares(backtester_sl) == expected_owned_shares)
+    assert(money_from_short(backtester_sl) == {})
 
 
 @pytest.mark.parametrize('backtester_sl', [(signals_test_stop_loss_1(), max_first_encountered_alpha_sizer(), 500)], indirect=True)
@@ -660,8 +673,8 @@ def test_functional_backtester_2_days_TEST_SL_1(backtester_sl):
     assert(backtester_sl._available_money == expected_available_money)
     assert(backtester_sl._account_value[ds_key] == expected_account_value)
     assert(backtester_sl._net_account_value[ds_key] == expected_nav)
-    assert(backtester_sl._owned_shares == expected_owned_shares)
-    assert(backtester_sl._money_from_short == {})
+    assert(owned_shares(backtester_sl) == expected_owned_shares)
+    assert(money_from_short(backtester_sl) == {})
 
 
 @pytest.mark.parametrize('backtester_sl', [(signals_test_stop_loss_1(), max_first_encountered_alpha_sizer(), 500)], indirect=True)
@@ -703,8 +716,11 @@ def test_functional_backtester_auto_stop_loss_1(backtester_auto_sl):
     ds_1 = pd.Timestamp('2010-09-29')
     ds_2 = pd.Timestamp('2010-10-01')
     assert(backtester_auto_sl._auto_stop_loss_tracker['TEST_ASL_1'] == 120.0)
-    assert(backtester_auto_sl.signals['TEST_ASL_1']['stop_loss'][ds_1] == 80)
-    assert(backtester_auto_sl.signals['TEST_ASL_1']['stop_loss'][ds_2] == 96) 
+    i_1 = backtester_auto_sl._index.get_loc(ds_1)
+    i_2 = backtester_auto_sl._index.get_loc(ds_2)
+    j = backtester_auto_sl._symbol_idx['TEST_ASL_1']
+    assert(backtester_auto_sl._stop_loss[i_1, j] == 80)
+    assert(backtester_auto_sl._stop_loss[i_2, j] == 96) 
 
 
 @pytest.mark.parametrize(
@@ -732,3 +748,25 @@ def test_functional_backtester_auto_stop_loss_2(backtester_auto_sl):
     assert(backtester_auto_sl._available_money == expected_available_money)
     assert(backtester_auto_sl._net_account_value[ds_key] == expected_nav)
     assert(expected_trades == trades)
+
+
+@pytest.mark.parametrize('backtester', [(signals_test_sigs_1(), max_first_encountered_alpha_sizer(), 500)], indirect=True)
+def test_trades_arrays_growing(backtester):
+    backtester._reset_backtest_state()
+    n_rows = len(backtester._trade_symbol)
+    for _ in range(n_rows):
+        backtester._buy(0, 0, 100, 1, 100, 0, 0)
+        backtester._sell('TEST_SIGS_1', 110, 1, 'long', 0)
+    backtester._buy(0, 1, 100, 1, 100, 0, 2)
+    assert(len(backtester._trade_symbol) == 2 * n_rows)
+    assert(backtester._n_trades == n_rows + 1)
+    assert((backtester._trade_sell_i[:n_rows] == 1).all())
+    assert((backtester._trade_sell_i[n_rows:] == -1).all())
+    assert(backtester._trade_id(n_rows) == '2010-09-30_TEST_SIGS_1_short')
+    assert(backtester._trades_output()['2010-09-30_TEST_SIGS_1_short'] == {
+        'buy_ds': pd.Timestamp('2010-09-30'),
+        'type': 'short',
+        'trx_value_no_fee': 100,
+        'trx_value_with_fee': 100,
+    })
+
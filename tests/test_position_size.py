@@ -168,6 +168,44 @@ def test_decide_what_to_buy_3_cans_with_sl(candidates_3_stop_loss):
     assert(symbols_to_buy == expected_symbols_to_buy)
 
 
+def test_calculate_fee_batch():
+    position_sizer = MaxFirstEncountered()
+    transaction_values = numpy.array([100, 984, 8901, 29876, 1200.6578947368421])
+    fees = position_sizer.calculate_fee_batch(transaction_values)
+    assert(fees.tolist() == [position_sizer.calculate_fee(v) for v in transaction_values.tolist()])
+    assert(fees.tolist() == [4, 4, 33.82, 113.53, 4.56])
+
+
+def test_calculate_fee_batch_uses_overridden_fee():
+    class FlatFee(MaxFirstEncountered):
+        def calculate_fee(self, transaction_value):
+            return 10
+    assert(FlatFee().calculate_fee_batch(numpy.array([100, 100000])).tolist() == [10, 10])
+
+
+def test_decide_batch_3_cans(candidates_3):
+    position_sizer = FixedCapitalPerc(sort_type='cheapest', capital_perc=0.1)
+    positions, shares_count, fees, trx_values = position_sizer.decide_batch(
+        50000,
+        numpy.array([c['symbol'] for c in candidates_3], dtype=object),
+        numpy.array([c['price'] for c in candidates_3], dtype=float),
+        numpy.array([c['entry_type'] for c in candidates_3]),
+        capital=100000,
+    )
+    # same decision as `decide_what_to_buy`, positions are in order of buying (cheapest first)
+    assert(positions.tolist() == [1, 0, 2])
+    assert(shares_count.tolist() == [96, 89, 51])
+    assert(fees.tolist() == [37.57, 37.54, 37.60])
+    assert(trx_values.tolist() == [9888, 9879, 9894])
+
+
+def test_decide_batch_no_candidates():
+    positions, shares_count, fees, trx_values = MaxFirstEncountered().decide_batch(
+        1000, numpy.array([], dtype=object), numpy.array([]), numpy.array([]),
+    )
+    assert(len(positions) == len(shares_count) == len(fees) == len(trx_values) == 0)
+
+
 def test_decide_what_to_buy_missing_sl_when_its_mandatory(candidates_1):
     with pytest.raises(ValueError):
         symbols_to_buy = PercentageRisk().decide_what_to_buy(1, candidates_1, capital=2)